@@ -1,16 +1,164 @@
-import librosa
 import numpy as np
+import scipy.fft
 import soundfile as sf
 import matplotlib.pyplot as plt
+import functools
 import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from 数据工具 import iter_audio_files
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _compute_pink_weights(n, sr):
+    """计算长度为 n、采样率为 sr 的粉红噪音频域权重 1/sqrt(f)"""
+    freq = np.fft.rfftfreq(n, 1/sr)
+    freq[0] = 1e-8  # 避免除零（rfftfreq 的第0项即直流分量）
+    return (1.0 / np.sqrt(freq)).astype(np.float32)
+
+# 单个文件的粉红噪音权重按 (音频长度, 采样率) 缓存
+_get_pink_weights = functools.lru_cache(maxsize=256)(_compute_pink_weights)
+
+if njit is not None:
+    # 安装了 numba 时，归一化、叠加、截断在一个编译循环中完成，只遍历一遍信号
+    @njit(fastmath=True)
+    def _mix_noise(y, noise, noise_level):
+        """把噪音归一化到 [-1,1] 后按强度叠加到音频，并截断到 [-1,1]"""
+        peak = 0.0
+        for i in range(noise.shape[0]):
+            v = abs(noise[i])
+            if v > peak:
+                peak = v
+        scale = noise_level / peak
+        out = np.empty_like(y)
+        for i in range(y.shape[0]):
+            v = y[i] + noise[i] * scale
+            out[i] = 1.0 if v > 1.0 else (-1.0 if v < -1.0 else v)
+        return out
+
+    @njit
+    def _add_impulses(y, impulse_pos, impulses, noise_level):
+        """在脉冲位置叠加已归一化的脉冲，并截断到 [-1,1]"""
+        out = y.astype(np.float32)
+        for i in range(impulse_pos.shape[0]):
+            out[impulse_pos[i]] += noise_level * impulses[i]
+        for i in range(out.shape[0]):
+            v = out[i]
+            out[i] = 1.0 if v > 1.0 else (-1.0 if v < -1.0 else v)
+        return out
+else:
+    def _mix_noise(y, noise, noise_level):
+        """把噪音归一化到 [-1,1] 后按强度叠加到音频，并截断到 [-1,1]"""
+        # 归一化系数并入噪音强度，缩放、叠加、截断都写入同一个输出数组
+        scale = noise_level / np.max(np.abs(noise))
+        out = np.empty_like(y)
+        np.multiply(noise, scale, out=out, casting="same_kind")
+        np.add(out, y, out=out)
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
+
+    def _add_impulses(y, impulse_pos, impulses, noise_level):
+        """在脉冲位置叠加已归一化的脉冲，并截断到 [-1,1]"""
+        out = y.astype(np.float32, copy=True)
+        np.add.at(out, impulse_pos, noise_level * impulses)
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
+
+# 每个线程独立的 int16 写出缓冲区，跨文件复用
+_pcm16_local = threading.local()
+
+def write_pcm16(output_path, y, sr):
+    """
+    以 16bit PCM 保存单声道音频：WAV 先转换到复用的 int16 缓冲区，再一次性写入；
+    其他格式（flac/mp3 等）的取整方式与这里不同，仍交给 sf.write 编码
+    :param output_path: 输出音频路径
+    :param y: 幅值在 [-1,1] 内的 float 音频（会被原地缩放取整）
+    :param sr: 采样率
+    """
+    if os.path.splitext(output_path)[1].lower() != ".wav":
+        sf.write(output_path, y, sr)
+        return
+    buf = getattr(_pcm16_local, "buf", None)
+    if buf is None or len(buf) < len(y):
+        buf = _pcm16_local.buf = np.empty(len(y), dtype=np.int16)
+    pcm = buf[:len(y)]
+    # 与 libsndfile 1.2.x 写 WAV 时的 float 转 PCM_16 一致：乘 32768 向下取整并截断到 int16 范围
+    # （只对 WAV 验证过；更早的 libsndfile 按 0x7FFF 缩放，结果可能相差 1 LSB）
+    y *= 32768
+    np.floor(y, out=y)
+    np.clip(y, -32768, 32767, out=y)
+    np.copyto(pcm, y, casting="unsafe")
+    with sf.SoundFile(output_path, "w", sr, 1, "PCM_16") as f:
+        f.buffer_write(pcm, dtype="int16")
+
+def load_audio(input_path):
+    """
+    读取音频为 float32 单声道，保持原采样率
+    :param input_path: 输入音频文件路径
+    :return: (音频数据, 采样率)
+    """
+    try:
+        # WAV/FLAC 直接用 soundfile 解码，避免 librosa 的额外开销和拷贝
+        y, sr = sf.read(input_path, dtype="float32", always_2d=False)
+    except Exception:
+        # mp3/m4a 等 soundfile 无法解码的格式回退到 librosa
+        import librosa
+        return librosa.load(input_path, sr=None)
+    if y.ndim > 1:
+        y = y.mean(axis=1)  # 与 librosa 一致，多声道混为单声道
+    return y, sr
+
+def _make_noise_fn(noise_type, noise_level):
+    """
+    按噪音类型构建加噪函数，类型分派只在构建时做一次
+    :param noise_type: 噪音类型
+    :param noise_level: 噪音强度系数
+    :return: 加噪函数 fn(y, sr, rng) -> noisy_y，结果已截断到 [-1,1]
+    """
+    if noise_type == "white":
+        # 白噪音：所有频率分量强度相同
+        def add_white_noise(y, sr, rng):
+            noise = rng.standard_normal(len(y), dtype=np.float32)
+            return _mix_noise(y, noise, noise_level)
+        return add_white_noise
+
+    if noise_type == "pink":
+        # 粉红噪音：低频能量更高，更接近环境噪音
+        def add_pink_noise(y, sr, rng):
+            noise = rng.standard_normal(len(y), dtype=np.float32)
+            # 频域处理实现粉红噪音特性
+            noise_fft = scipy.fft.rfft(noise, workers=-1)
+            noise_fft *= _get_pink_weights(len(y), sr)
+            noise = scipy.fft.irfft(noise_fft, n=len(y), workers=-1)
+            return _mix_noise(y, noise, noise_level)
+        return add_pink_noise
+
+    if noise_type == "impulse":
+        # 脉冲噪音：随机出现的尖锐噪声（模拟电流声/爆音）
+        # 只在稀疏的脉冲位置上计算，避免构造整段全零噪音数组
+        def add_impulse_noise(y, sr, rng):
+            num_impulses = int(len(y) * 0.001)  # 脉冲数量
+            impulse_pos = rng.integers(0, len(y), num_impulses, dtype=np.int32)
+            impulses = rng.standard_normal(num_impulses, dtype=np.float32) * 5
+            if num_impulses > 0:
+                impulses /= np.abs(impulses).max()  # 脉冲幅值归一化到 [-1,1]
+            return _add_impulses(y, impulse_pos, impulses, noise_level)
+        return add_impulse_noise
+
+    raise ValueError(f"不支持的噪音类型: {noise_type}")
 
 def add_noise_to_audio(
     input_path,
     output_path,
     noise_type="impulse",  # white/pink/impulse
     noise_level=0.02,    # 噪音强度，值越大噪音越明显
-    seed=42              # 随机种子，保证结果可复现
+    seed=42,             # 随机种子，保证结果可复现
+    noise_fn=None        # 预先构建的加噪函数，批处理时复用
 ):
     """
     给音频添加指定类型的噪音
@@ -19,46 +167,24 @@ def add_noise_to_audio(
     :param noise_type: 噪音类型
     :param noise_level: 噪音强度系数
     :param seed: 随机种子
+    :param noise_fn: _make_noise_fn 构建的加噪函数，指定时忽略 noise_type/noise_level
     """
     try:
-        # 1. 读取音频
-        y, sr = librosa.load(input_path, sr=None)  # sr=None 保持原采样率
-        np.random.seed(seed)
-
-        # 2. 生成对应类型的噪音
-        if noise_type == "white":
-            # 白噪音：所有频率分量强度相同
-            noise = np.random.normal(0, 1, len(y))
-        elif noise_type == "pink":
-            # 粉红噪音：低频能量更高，更接近环境噪音
-            noise = np.random.normal(0, 1, len(y))
-            # 频域处理实现粉红噪音特性
-            noise_fft = np.fft.rfft(noise)
-            freq = np.fft.rfftfreq(len(y), 1/sr)
-            freq[freq == 0] = 1e-8  # 避免除零
-            noise_fft /= np.sqrt(freq)
-            noise = np.fft.irfft(noise_fft)
-        elif noise_type == "impulse":
-            # 脉冲噪音：随机出现的尖锐噪声（模拟电流声/爆音）
-            noise = np.zeros(len(y))
-            num_impulses = int(len(y) * 0.001)  # 脉冲数量
-            impulse_pos = np.random.randint(0, len(y), num_impulses)
-            noise[impulse_pos] = np.random.normal(0, 5, num_impulses)
-        else:
-            raise ValueError(f"不支持的噪音类型: {noise_type}")
+        if noise_fn is None:
+            noise_fn = _make_noise_fn(noise_type, noise_level)
 
-        # 3. 归一化噪音并叠加到原音频
-        noise = noise / np.max(np.abs(noise))  # 噪音归一化到 [-1,1]
-        noisy_y = y + noise_level * noise
+        # 1. 读取音频（保持原采样率，统一为 float32 单声道）
+        y, sr = load_audio(input_path)
+        rng = np.random.default_rng(seed)  # 独立的随机数生成器，不修改全局随机状态
 
-        # 4. 防止音频过载（幅值超过1会失真）
-        noisy_y = np.clip(noisy_y, -1.0, 1.0)
+        # 2. 生成噪音，归一化后叠加到原音频，并防止音频过载（幅值超过1会失真）
+        noisy_y = noise_fn(y, sr, rng)
 
-        # 5. 确保输出文件夹存在
+        # 3. 确保输出文件夹存在
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # 6. 保存带噪音的音频
-        sf.write(output_path, noisy_y, sr)
+        # 4. 保存带噪音的音频
+        write_pcm16(output_path, noisy_y, sr)
         print(f"✅ 带噪音的音频已保存到: {output_path}")
         
         return True
@@ -67,48 +193,264 @@ def add_noise_to_audio(
         print(f"❌ 处理文件 {input_path} 失败: {str(e)}")
         return False
 
+def _load_audio_or_none(input_path):
+    """读取音频，失败时打印错误并返回 None"""
+    try:
+        return load_audio(input_path)
+    except Exception as e:
+        print(f"❌ 处理文件 {input_path} 失败: {str(e)}")
+        return None
+
+def _save_audio(output_path, y, sr):
+    """保存音频（自动创建输出文件夹），返回是否成功"""
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        write_pcm16(output_path, y, sr)
+        print(f"✅ 带噪音的音频已保存到: {output_path}")
+        return True
+    except Exception as e:
+        print(f"❌ 保存文件 {output_path} 失败: {str(e)}")
+        return False
+
+def batch_add_pink(tasks, noise_level=0.02, seed=42):
+    """
+    批量添加粉红噪音：同一采样率的文件共用一段长噪音，只做一次FFT滤波，
+    再按各文件长度切成互不重叠的片段（粉红滤波是线性的，切出的片段仍是粉红噪音）
+    :param tasks: (输入音频路径, 输出音频路径) 列表
+    :param noise_level: 噪音强度系数
+    :param seed: 随机种子
+    :return: 成功处理的文件数
+    """
+    rng = np.random.default_rng(seed)
+
+    # 按采样率分组
+    groups = {}
+    for input_path, output_path in tasks:
+        audio = _load_audio_or_none(input_path)
+        if audio is not None:
+            y, sr = audio
+            groups.setdefault(sr, []).append((input_path, output_path, y))
+
+    processed_count = 0
+    for sr, items in groups.items():
+        total = sum(len(y) for _, _, y in items)
+        # 总长度是任意值（可能是质数，FFT极慢），补到FFT的快速长度，多出的尾部丢弃不用
+        n_fft = scipy.fft.next_fast_len(total, real=True)
+        noise_all = rng.standard_normal(n_fft, dtype=np.float32)
+        noise_fft = scipy.fft.rfft(noise_all, workers=-1)
+        # 长噪音的长度每批都不同，权重不进缓存
+        noise_fft *= _compute_pink_weights(n_fft, sr)
+        noise_all = scipy.fft.irfft(noise_fft, n=n_fft, workers=-1)
+
+        offset = 0
+        for input_path, output_path, y in items:
+            noise = noise_all[offset:offset + len(y)]
+            offset += len(y)
+            try:
+                # 每段噪音单独归一化后叠加，并防止音频过载
+                noisy_y = _mix_noise(y, noise, noise_level)
+            except Exception as e:
+                print(f"❌ 处理文件 {input_path} 失败: {str(e)}")
+                continue
+            processed_count += _save_audio(output_path, noisy_y, sr)
+
+    return processed_count
+
+def gpu_batch_add_noise(
+    tasks,
+    noise_type="white",
+    noise_level=0.02,
+    seed=42,
+    device="cuda",
+    batch_size=64,
+    num_io_threads=8
+):
+    """
+    在GPU上批量给音频添加噪音：同一批次、同一采样率的音频补零对齐后
+    堆叠成 [B, T] 张量，噪音生成、滤波、归一化、叠加和截断都在GPU上一次完成
+    整个任务列表共用一个随机数生成器，每个文件得到的噪音取决于它在列表中的位置
+    和同批次的文件（补零长度），只有任务列表顺序固定时结果才可复现；
+    同一种子下的结果也与CPU路径不同
+    :param tasks: (输入音频路径, 输出音频路径) 列表（调用方应先排序）
+    :param noise_type: 噪音类型
+    :param noise_level: 噪音强度系数
+    :param seed: 随机种子
+    :param device: torch 设备，如 "cuda"、"cuda:1"
+    :param batch_size: 每批处理的文件数
+    :param num_io_threads: 读写音频的线程数
+    :return: 成功处理的文件数
+    """
+    import torch
+
+    if noise_type not in ("white", "pink", "impulse"):
+        raise ValueError(f"不支持的噪音类型: {noise_type}")
+
+    # 粉红噪音权重与CPU路径共用同一份缓存，每种 (长度, 采样率) 只拷贝到设备一次
+    pink_weights = {}
+
+    def _get_pink_weights_tensor(n, sr):
+        weights = pink_weights.get((n, sr))
+        if weights is None:
+            weights = torch.from_numpy(_get_pink_weights(n, sr)).to(device)
+            pink_weights[(n, sr)] = weights
+        return weights
+
+    generator = torch.Generator(device=device)
+    generator.manual_seed(seed)
+    processed_count = 0
+
+    with ThreadPoolExecutor(max_workers=num_io_threads) as io_pool:
+        for start in range(0, len(tasks), batch_size):
+            batch = tasks[start:start + batch_size]
+            loaded = list(io_pool.map(_load_audio_or_none, [t[0] for t in batch]))
+
+            # 按采样率分组，同组音频补零到相同长度后堆叠
+            groups = {}
+            for (_, output_path), audio in zip(batch, loaded):
+                if audio is not None:
+                    y, sr = audio
+                    groups.setdefault(sr, []).append((output_path, y))
+
+            for sr, items in groups.items():
+                lengths = [len(y) for _, y in items]
+                T = max(lengths)
+                wave = np.zeros((len(items), T), dtype=np.float32)
+                for i, (_, y) in enumerate(items):
+                    wave[i, :len(y)] = y
+                x = torch.from_numpy(wave).to(device, non_blocking=True)
+                B = x.shape[0]
+                lens = torch.tensor(lengths, device=device)
+
+                # 1. 生成对应类型的噪音
+                if noise_type == "white":
+                    noise = torch.randn((B, T), generator=generator, device=device)
+                elif noise_type == "pink":
+                    noise = torch.randn((B, T), generator=generator, device=device)
+                    noise_fft = torch.fft.rfft(noise, dim=-1)
+                    noise_fft *= _get_pink_weights_tensor(T, sr)
+                    noise = torch.fft.irfft(noise_fft, n=T, dim=-1)
+                else:
+                    # 每个文件的脉冲数按各自长度计算，多余的脉冲幅值置零
+                    num_impulses = (lens * 0.001).long()
+                    k = max(int(num_impulses.max()), 1)
+                    impulse_pos = (torch.rand((B, k), generator=generator, device=device)
+                                   * lens.unsqueeze(1)).long()
+                    impulses = torch.randn((B, k), generator=generator, device=device)
+                    impulses *= torch.arange(k, device=device) < num_impulses.unsqueeze(1)
+                    noise = torch.zeros((B, T), device=device)
+                    noise.scatter_add_(1, impulse_pos, impulses)
+
+                # 2. 补零部分的噪音置零（粉红噪音在 irfft 之后），只按各文件自身长度内的峰值归一化
+                noise *= torch.arange(T, device=device) < lens.unsqueeze(1)
+
+                # 3. 逐条归一化噪音，叠加并防止过载
+                noise /= noise.abs().amax(dim=-1, keepdim=True).clamp_min_(1e-12)
+                x.add_(noise, alpha=noise_level).clamp_(-1.0, 1.0)
+                noisy = x.cpu().numpy()
+
+                # 4. 去掉补零部分并保存
+                results = io_pool.map(
+                    lambda i: _save_audio(items[i][0], noisy[i, :lengths[i]], sr),
+                    range(B))
+                processed_count += sum(results)
+
+    return processed_count
+
+# 进程池中每个工作进程各自构建一次的加噪函数（闭包无法跨进程传递）
+_worker_noise_fn = None
+
+def _init_worker(noise_type, noise_level):
+    """进程池初始化函数：在工作进程中构建加噪函数"""
+    global _worker_noise_fn
+    _worker_noise_fn = _make_noise_fn(noise_type, noise_level)
+
+def _process_task(task):
+    """进程池工作函数：解包任务参数并处理单个文件，返回成功处理的文件数"""
+    input_path, output_path, file_seed = task
+    return int(add_noise_to_audio(input_path, output_path, seed=file_seed, noise_fn=_worker_noise_fn))
+
 def batch_process_audio_folder(
     input_folder,
     output_folder,
     noise_type="white",
     noise_level=0.02,
-    seed=42
+    seed=42,
+    num_workers=None,
+    device=None,
+    pink_batch_size=1
 ):
     """
     批量处理文件夹中以base/aug开头的音频文件
+    默认（CPU）每个文件使用由全局种子和相对路径派生的独立种子，结果与处理顺序和其他文件无关；
+    粉红噪音显式按批生成（pink_batch_size>1）时例外：整批共用第一个文件的种子，
+    增删文件会改变分批边界，从而改变其后所有文件的噪音
     :param input_folder: 输入音频文件夹路径
     :param output_folder: 输出音频文件夹路径
     :param noise_type: 噪音类型
     :param noise_level: 噪音强度
     :param seed: 随机种子
+    :param num_workers: 并行进程数，默认使用全部CPU核心
+    :param device: 指定 torch 设备（如 "cuda"）时在GPU上批量处理，默认使用CPU进程池；
+                   GPU 结果取决于同批次的文件组成，同一种子下与CPU结果不同
+    :param pink_batch_size: CPU上添加粉红噪音时，每批共用一段长噪音的文件数；
+                            默认1即逐文件生成，结果与其他文件无关；
+                            大于1时结果依赖分批（增删文件会影响其后文件的噪音），
+                            且只在片段很多、很短时才可能更快
     """
     # 支持的音频格式
     supported_formats = (".wav", ".flac", ".mp3", ".m4a")
     
-    # 遍历文件夹中的所有文件
-    processed_count = 0
+    # 遍历前先校验噪音类型（不支持的类型直接报错）
+    _make_noise_fn(noise_type, noise_level)
+    
+    # 遍历文件夹，先收集所有待处理任务
+    tasks = []
     skipped_count = 0
     
-    for root, dirs, files in os.walk(input_folder):
-        for file in files:
-            # 筛选条件：1. 是音频文件 2. 文件名以base或aug开头
-            if file.lower().endswith(supported_formats) and (file.startswith("base") or file.startswith("aug")):
-                # 构建输入文件路径
-                input_path = os.path.join(root, file)
-                
-                # 构建输出文件路径（保持原文件夹结构）
-                relative_path = os.path.relpath(input_path, input_folder)
-                output_path = os.path.join(output_folder, relative_path)
-                
-                # 给输出文件名添加噪音类型后缀（方便区分）
-                filename, ext = os.path.splitext(output_path)
-                output_path = f"{filename}_{noise_type}_noise{noise_level}{ext}"
-                
-                # 处理当前文件
-                if add_noise_to_audio(input_path, output_path, noise_type, noise_level, seed):
-                    processed_count += 1
-            else:
-                skipped_count += 1
+    for input_path, file in iter_audio_files(input_folder, supported_formats):
+        # 筛选条件：文件名以base或aug开头
+        if file.startswith(("base", "aug")):
+            # 构建输出文件路径（保持原文件夹结构）
+            relative_path = os.path.relpath(input_path, input_folder)
+            output_path = os.path.join(output_folder, relative_path)
+            
+            # 给输出文件名添加噪音类型后缀（方便区分）
+            filename, ext = os.path.splitext(output_path)
+            output_path = f"{filename}_{noise_type}_noise{noise_level}{ext}"
+            
+            # 每个文件的种子由全局种子和相对路径派生，与处理顺序无关，保证可复现
+            file_seed = (seed + zlib.crc32(relative_path.encode("utf-8"))) & 0xffffffff
+            tasks.append((input_path, output_path, file_seed))
+        else:
+            skipped_count += 1
+    
+    if device is not None:
+        # GPU 批处理：噪音按任务顺序和批次组成生成，排序后不依赖文件系统的遍历顺序
+        tasks.sort()
+        processed_count = gpu_batch_add_noise(
+            [(input_path, output_path) for input_path, output_path, _ in tasks],
+            noise_type, noise_level, seed, device)
+    elif noise_type == "pink" and pink_batch_size > 1:
+        # 粉红噪音按批生成：每批文件共用一次FFT，批之间用进程池并行处理
+        # 排序后分批，保证每批的文件和种子固定，结果可复现（但依赖数据集中的全部文件）
+        tasks.sort()
+        batches = [tasks[i:i + pink_batch_size] for i in range(0, len(tasks), pink_batch_size)]
+        processed_count = 0
+        with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+            for count in executor.map(
+                    batch_add_pink,
+                    [[(input_path, output_path) for input_path, output_path, _ in batch] for batch in batches],
+                    [noise_level] * len(batches),
+                    [batch[0][2] for batch in batches]):
+                processed_count += count
+    else:
+        # 各文件相互独立，用进程池并行处理
+        processed_count = 0
+        with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count(),
+                                 initializer=_init_worker,
+                                 initargs=(noise_type, noise_level)) as executor:
+            for ok in executor.map(_process_task, tasks, chunksize=32):
+                processed_count += ok
     
     # 输出处理统计
     print("\n" + "="*50)
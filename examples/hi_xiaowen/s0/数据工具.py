@@ -0,0 +1,43 @@
+import os
+
+def iter_audio_files(root, audio_formats):
+    """
+    递归遍历文件夹，逐个返回音频文件（只包含普通文件，不跟随符号链接）
+    基于 os.scandir 实现，直接使用目录项自带的文件名、路径和类型信息，
+    避免 os.walk 的额外 stat 调用和 os.path.join 拼接开销
+    :param root: 要遍历的文件夹路径
+    :param audio_formats: 支持的音频格式（小写后缀元组）
+    :return: (文件路径, 文件名) 生成器
+    """
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                # 只保留普通文件，跳过符号链接和特殊文件（类型信息来自目录项，无需额外 stat）
+                elif entry.name.lower().endswith(audio_formats) and entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.name
+
+def split_files(folder, audio_formats, positive_prefixes):
+    """
+    遍历文件夹，按文件名前缀把音频文件分为正样本和副样本
+    :param folder: 要遍历的文件夹路径
+    :param audio_formats: 支持的音频格式（小写后缀元组）
+    :param positive_prefixes: 正样本文件名前缀（列表或元组）
+    :return: (正样本路径列表, 副样本路径列表)，均按路径排序
+    """
+    # str.startswith 直接接受元组，在C层完成多前缀匹配
+    positive_prefixes = tuple(positive_prefixes)
+    positive_files = []
+    negative_files = []
+    for file_path, file in iter_audio_files(folder, audio_formats):
+        if file.startswith(positive_prefixes):
+            positive_files.append(file_path)
+        else:
+            negative_files.append(file_path)
+    # 排序后结果与遍历顺序和文件系统无关，同一随机种子的抽样/划分结果固定
+    positive_files.sort()
+    negative_files.sort()
+    return positive_files, negative_files
@@ -1,14 +1,50 @@
 import os
 import random
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from tqdm import tqdm
+from 数据工具 import split_files
+
+def _fast_copy(src, dst):
+    """
+    复制文件的快速路径：同一文件系统下优先创建硬链接（不拷贝数据），
+    其次用 os.copy_file_range 在内核中复制，都不可用时回退到 shutil.copy2
+    :param src: 源文件路径
+    :param dst: 目标文件路径
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        if remaining == 0:
+            shutil.copystat(src, dst)  # 与 copy2 一致，保留文件元信息
+            return
+    except (AttributeError, OSError):
+        pass
+    shutil.copy2(src, dst)
+
+def _out_path(file_path, input_folder, output_folder):
+    """计算文件在输出文件夹中的路径，保持原文件夹结构"""
+    relative_path = os.path.relpath(file_path, input_folder)
+    return os.path.join(output_folder, relative_path)
 
 def balance_samples(
     input_folder,
     output_folder,
     positive_prefixes=["base", "aug"],  # 正样本前缀
     audio_formats=(".wav", ".flac", ".mp3", ".m4a"),  # 支持的音频格式
-    random_seed=42  # 固定随机种子，保证每次抽取结果一致
+    random_seed=42,  # 固定随机种子，保证每次抽取结果一致
+    num_workers=16  # 并行复制文件的线程数
 ):
     """
     平衡样本：保留所有正样本 + 随机抽取等量副样本，保存到新文件夹
@@ -18,25 +54,15 @@ def balance_samples(
     :param positive_prefixes: 正样本文件名前缀列表
     :param audio_formats: 支持的音频文件格式
     :param random_seed: 随机种子（保证可复现）
+    :param num_workers: 并行复制文件的线程数
     """
     # 1. 初始化随机种子
     random.seed(random_seed)
     
     # 2. 遍历文件夹，分离正样本和副样本
-    positive_files = []  # 存储所有正样本路径
-    negative_files = []  # 存储所有副样本路径
-    
     print(f"正在遍历文件夹: {input_folder}")
-    for root, dirs, files in os.walk(input_folder):
-        for file in files:
-            # 只处理音频文件
-            if file.lower().endswith(audio_formats):
-                file_path = os.path.join(root, file)
-                # 判断是否为正样本（以指定前缀开头）
-                if any(file.startswith(prefix) for prefix in positive_prefixes):
-                    positive_files.append(file_path)
-                else:
-                    negative_files.append(file_path)
+    # positive_files: 所有正样本路径（以指定前缀开头），negative_files: 所有副样本路径
+    positive_files, negative_files = split_files(input_folder, audio_formats, positive_prefixes)
     
     # 3. 输出统计信息
     pos_count = len(positive_files)
@@ -63,26 +89,26 @@ def balance_samples(
     os.makedirs(output_folder, exist_ok=True)
     
     # 8. 复制选中的文件到输出文件夹（保留原目录结构）
+    output_paths = [_out_path(file_path, input_folder, output_folder) for file_path in selected_files]
+    
+    # 预先创建所有输出子目录，避免在复制循环中重复调用 makedirs
+    for output_dir in {os.path.dirname(output_path) for output_path in output_paths}:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    # 复制是 I/O 密集型操作，用线程池并行复制（优先硬链接，保留文件元信息）
     copied_count = 0
-    for file_path in selected_files:
-        try:
-            # 计算相对路径，保持原文件夹结构
-            relative_path = os.path.relpath(file_path, input_folder)
-            output_path = os.path.join(output_folder, relative_path)
-            
-            # 创建输出子目录
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # 复制文件
-            shutil.copy2(file_path, output_path)  # copy2 保留文件元信息
-            copied_count += 1
-            
-            # 每复制1000个文件输出进度
-            if copied_count % 1000 == 0:
-                print(f"📤 已复制 {copied_count}/{len(selected_files)} 个文件")
-                
-        except Exception as e:
-            print(f"❌ 复制文件失败 {file_path}: {str(e)}")
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            executor.submit(_fast_copy, file_path, output_path): file_path
+            for file_path, output_path in zip(selected_files, output_paths)
+        }
+        # 用 tqdm 显示复制进度
+        for future in tqdm(as_completed(futures), total=len(futures), desc="📤 复制文件", mininterval=0.5):
+            try:
+                future.result()
+                copied_count += 1
+            except Exception as e:
+                tqdm.write(f"❌ 复制文件失败 {futures[future]}: {str(e)}")
     
     # 9. 输出最终结果
     print("\n" + "="*60)
@@ -1,7 +1,27 @@
 import os
 import json
-import random
+import numpy as np
 from pathlib import Path
+from 数据工具 import split_files
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dump_json(data, file_path):
+    """
+    一次性编码并写入JSON文件（大缓冲区）
+    优先使用 orjson（C实现，缩进2格）；未安装时用标准库 json 的C编码器，
+    每条数据单独一行，兼顾速度和可读性
+    """
+    if orjson is not None:
+        data_bytes = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        lines = ",\n".join("  " + json.dumps(item, ensure_ascii=False) for item in data)
+        data_bytes = f"[\n{lines}\n]".encode("utf-8") if data else b"[]"
+    with open(file_path, "wb", buffering=1 << 20) as f:
+        f.write(data_bytes)
 
 def split_and_generate_labels(
     balanced_folder,
@@ -21,24 +41,16 @@ def split_and_generate_labels(
     :param audio_formats: 支持的音频格式
     :param random_seed: 随机种子（保证划分结果可复现）
     """
-    # 1. 初始化随机种子
-    random.seed(random_seed)
+    # 1. 初始化随机数生成器
+    rng = np.random.default_rng(random_seed)
     
     # 2. 遍历文件夹，分离正/副样本（提取文件名，去掉后缀）
-    positive_samples = []  # 正样本文件名（无后缀）
-    negative_samples = []  # 副样本文件名（无后缀）
-    
     print(f"正在遍历平衡数据集文件夹: {balanced_folder}")
-    for root, dirs, files in os.walk(balanced_folder):
-        for file in files:
-            if file.lower().endswith(audio_formats):
-                # 提取纯文件名（去掉后缀）
-                file_name = os.path.splitext(file)[0]
-                # 判断正/副样本
-                if any(file.startswith(prefix) for prefix in positive_prefixes):
-                    positive_samples.append(file_name)
-                else:
-                    negative_samples.append(file_name)
+    positive_files, negative_files = split_files(balanced_folder, audio_formats, positive_prefixes)
+    
+    # 提取纯文件名（去掉后缀）
+    positive_samples = [os.path.splitext(os.path.basename(p))[0] for p in positive_files]  # 正样本文件名
+    negative_samples = [os.path.splitext(os.path.basename(p))[0] for p in negative_files]  # 副样本文件名
     
     # 3. 输出基础统计
     pos_count = len(positive_samples)
@@ -69,15 +81,15 @@ def split_and_generate_labels(
     print(f"   正样本 - dev: {p_dev_num} | test: {p_test_num} | train: {p_train_num}")
     print(f"   副样本 - dev: {n_dev_num} | test: {n_test_num} | train: {n_train_num}")
     
-    # 5. 随机打乱并划分数据
+    # 5. 随机打乱并划分数据（object 数组保持元素为 Python 字符串，切片不拷贝数据）
     # 正样本划分
-    random.shuffle(positive_samples)
+    positive_samples = np.array(positive_samples, dtype=object)[rng.permutation(pos_count)]
     p_dev = positive_samples[:p_dev_num]
     p_test = positive_samples[p_dev_num:p_dev_num+p_test_num]
     p_train = positive_samples[p_dev_num+p_test_num:]
     
     # 副样本划分
-    random.shuffle(negative_samples)
+    negative_samples = np.array(negative_samples, dtype=object)[rng.permutation(neg_count)]
     n_dev = negative_samples[:n_dev_num]
     n_test = negative_samples[n_dev_num:n_dev_num+n_test_num]
     n_train = negative_samples[n_dev_num+n_test_num:]
@@ -85,14 +97,10 @@ def split_and_generate_labels(
     # 6. 构建标签数据结构
     def build_label_list(sample_list, keyword_id):
         """生成标签列表（统一格式）"""
-        label_list = []
-        for utt_id in sample_list:
-            label_list.append({
-                "utt_id": utt_id,
-                "speaker_id": utt_id,
-                "keyword_id": keyword_id
-            })
-        return label_list
+        return [
+            {"utt_id": utt_id, "speaker_id": utt_id, "keyword_id": keyword_id}
+            for utt_id in sample_list
+        ]
     
     # 正样本标签（keyword_id=0）
     p_dev_labels = build_label_list(p_dev, 0)
@@ -119,8 +127,7 @@ def split_and_generate_labels(
     
     for file_name, data in label_files.items():
         file_path = os.path.join(output_label_folder, file_name)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        _dump_json(data, file_path)
         print(f"✅ 标签文件已保存: {file_path} (共{len(data)}条数据)")
     
     # 9. 输出最终统计